@@ -0,0 +1 @@
+# Makes the top-level core and gui packages importable from tests/
@@ -1,49 +1,245 @@
+import os
+
 import loristrck as lt
 import numpy as np
 import soundfile as sf
 
+ANALYSIS_DTYPE = np.dtype([('time', 'f4'),
+                           ('freq', 'f4'),
+                           ('amp', 'f4'),
+                           ('phase', 'f4')])
+
+# Files whose decoded signal would exceed this many bytes are analyzed in blocks
+MAX_SIGNAL_BYTES = 1 << 30
+# Frames per block when streaming a long file through the analysis
+BLOCK_SIZE = 1 << 22
+# Blocks overlap by this many analysis windows, so partials crossing a block
+# boundary are already established in the next block when they reach it
+BLOCK_OVERLAP_WINDOWS = 4
+# Largest relative frequency difference for joining a partial cut at a block
+# boundary with one continuing in the next block
+JOIN_FREQ_TOLERANCE = 0.03
+# Breakpoint rows reserved per block before the streamed buffer has to grow
+INITIAL_ROWS_PER_BLOCK = 4096
+# Number of recent (signal, parameters) analyses kept for instant re-use
+ANALYSIS_CACHE_SIZE = 4
+
+def _match_by_frequency(tail_freqs, head_freqs):
+    """Pair partial ends with partial starts of the closest frequency
+
+    Returns (tail index, head index) pairs, matched greedily from the closest
+    pair down and only within JOIN_FREQ_TOLERANCE.
+    """
+    candidates = sorted(
+        (abs(hf - tf) / max(tf, 1e-9), ti, hi)
+        for ti, tf in enumerate(tail_freqs)
+        for hi, hf in enumerate(head_freqs)
+        if abs(hf - tf) <= JOIN_FREQ_TOLERANCE * max(tf, 1e-9)
+    )
+    used_tails, used_heads = set(), set()
+    pairs = []
+    for _, ti, hi in candidates:
+        if ti not in used_tails and hi not in used_heads:
+            used_tails.add(ti)
+            used_heads.add(hi)
+            pairs.append((ti, hi))
+    return pairs
+
 class SpectralAnalyzer:
     def __init__(self):
         self.partials = None
         self.sr = 44100
         self.signal = None
+        self._signal_stamp = None
+        self._cache = {}
+
+    def analyze_file(self, path, blocksize=BLOCK_SIZE, cancelled=None, **params):
+        """Main analysis entry point
+
+        cancelled is an optional callable polled between blocks of a streamed
+        analysis; when it returns True the analysis stops and the previous
+        partials are kept.
+        """
+        info = sf.info(path)
+        self.sr = info.samplerate
+        if info.frames * info.channels * 8 > MAX_SIGNAL_BYTES:
+            self.signal = None
+            self._signal_stamp = None
+            self._cache.clear()
+            self.analyze_blocks(path, blocksize, cancelled, **params)
+            return
+
+        # Keep the decoded buffer while the file is unchanged so repeated
+        # analyses of it can hit the analysis cache
+        stamp = (os.path.abspath(path), os.path.getmtime(path))
+        if self.signal is None or stamp != self._signal_stamp:
+            # Cached entries pin their signals; release the old one before
+            # decoding the new file
+            self.signal = None
+            self._cache.clear()
+            # loristrck only accepts float64 samples
+            sig, self.sr = sf.read(path, dtype='float64', always_2d=False)
+            # Convert to mono if stereo
+            if sig.ndim > 1 and sig.shape[1] > 1:
+                sig = sig.mean(axis=1)
+            elif sig.ndim > 1:
+                sig = np.ascontiguousarray(sig[:, 0])
+            self.signal = sig
+            self._signal_stamp = stamp
+        self.analyze_signal(self.signal, **params)
+
+    def analyze_blocks(self, path, blocksize=BLOCK_SIZE, cancelled=None, **params):
+        """Analyze a file block by block so memory stays bounded by the block size
 
-    def analyze_file(self, path, **params):
-        """Main analysis entry point"""
-        sig, self.sr = sf.read(path)
-        # Convert to mono if stereo
-        if len(sig.shape) > 1:
-            sig = sig.mean(axis=1)
-        self.signal = sig
-        self.analyze_signal(sig, **params)
+        Consecutive blocks overlap by a few analysis windows, and the boundary
+        between two blocks lies halfway through their overlap. Each block only
+        keeps the breakpoints on its own side of its boundaries. A partial cut
+        at a boundary is joined with the partial of the next block that picks
+        up there at the closest frequency, so notes held across blocks stay
+        continuous.
+        """
+        overlap = min(BLOCK_OVERLAP_WINDOWS * params.get('win_size', 2048), blocksize // 2)
+        step = blocksize - overlap
+        frames = sf.info(path).frames
+        # Breakpoints of all finished partials share one growable buffer; ends
+        # records where each partial stops. It matches lt.analyze's float64
+        # output, which lt.synthesize requires and long files need for time
+        # precision
+        n_blocks = max(1, -(-(frames - overlap) // step))
+        buf = np.empty((INITIAL_ROWS_PER_BLOCK * n_blocks, 5), dtype=np.float64)
+        n = 0
+        ends = []
+
+        def store(chunks):
+            nonlocal buf, n
+            rows = chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+            if n + len(rows) > buf.shape[0]:
+                grown = np.empty((max(2 * buf.shape[0], n + len(rows)), 5), dtype=np.float64)
+                grown[:n] = buf[:n]
+                buf = grown
+            buf[n:n + len(rows)] = rows
+            n += len(rows)
+            ends.append(n)
+
+        # Partials cut at the previous boundary, each as a list of row chunks
+        open_partials = []
+        # loristrck only accepts float64 samples
+        blocks = sf.blocks(path, blocksize=blocksize, overlap=overlap,
+                           dtype='float64', always_2d=False)
+        for i, block in enumerate(blocks):
+            if cancelled is not None and cancelled():
+                return
+            if block.ndim > 1:
+                block = block.mean(axis=1)
+            offset = i * step / self.sr
+            # Time span owned by this block, relative to the block start
+            t0 = overlap / 2 / self.sr if i > 0 else -np.inf
+            last = i * step + blocksize >= frames
+            t1 = (step + overlap / 2) / self.sr if not last else np.inf
+
+            # (chunks, cut at t1) for every partial with breakpoints in the
+            # span, and the indices of those that were already sounding at t0
+            entries = []
+            heads = []
+            for partial in self._track(block, **params):
+                times = partial[:, 0]
+                rows = partial[(times >= t0) & (times < t1)]
+                if not len(rows):
+                    continue
+                rows[:, 0] += offset
+                if times[0] < t0:
+                    heads.append(len(entries))
+                entries.append(([rows], times[-1] >= t1))
+
+            joined = set()
+            for ti, hi in _match_by_frequency(
+                    [tail[-1][-1, 1] for tail in open_partials],
+                    [entries[e][0][0][0, 1] for e in heads]):
+                tail = open_partials[ti]
+                chunks, cut = entries[heads[hi]]
+                tail.extend(chunks)
+                entries[heads[hi]] = (tail, cut)
+                joined.add(ti)
+            for ti, tail in enumerate(open_partials):
+                if ti not in joined:
+                    store(tail)
+
+            open_partials = []
+            for chunks, cut in entries:
+                if cut:
+                    open_partials.append(chunks)
+                else:
+                    store(chunks)
+        for chunks in open_partials:
+            store(chunks)
+        # Hand out each partial as a view into one buffer trimmed to the rows
+        # in use, so the spare capacity is not kept alive by the partials
+        self.partials = np.split(buf[:n].copy(), ends[:-1]) if ends else []
 
     def analyze_signal(self, sig, win_size=2048, hop=256,
                       threshold=-90, min_dur=0.05, max_partials=100):
-        """Perform partial tracking analysis"""
+        """Perform partial tracking analysis
+
+        Results are cached per signal buffer and parameter set, so sweeping a
+        parameter back to a recently used value does not re-run the tracking.
+        """
+        key = (sig.ctypes.data, sig.size, self.sr,
+               win_size, hop, threshold, min_dur, max_partials)
+        entry = self._cache.pop(key, None)
+        # The entry holds a reference to its signal, so a matching identity
+        # rules out a new buffer that happens to reuse the same address
+        if entry is None or entry[0] is not sig:
+            entry = (sig, self._track(sig, win_size, hop, threshold,
+                                      min_dur, max_partials))
+        self._cache[key] = entry
+        if len(self._cache) > ANALYSIS_CACHE_SIZE:
+            del self._cache[next(iter(self._cache))]
+        self.partials = entry[1]
+
+    def _track(self, sig, win_size=2048, hop=256,
+               threshold=-90, min_dur=0.05, max_partials=100):
+        """Run loristrck partial tracking on a mono signal"""
         # Pass all arguments as positional arguments in the correct order
-        self.partials = lt.analyze(sig,          # input signal
-                                 self.sr,         # sample rate
-                                 win_size,        # window size
-                                 hop,             # hop size
-                                 threshold,       # threshold in dB
-                                 min_dur,         # minimum duration in seconds
-                                 max_partials)    # maximum number of partials
+        return lt.analyze(sig,          # input signal
+                          self.sr,         # sample rate
+                          win_size,        # window size
+                          hop,             # hop size
+                          threshold,       # threshold in dB
+                          min_dur,         # minimum duration in seconds
+                          max_partials)    # maximum number of partials
 
     def get_analysis_data(self):
         """Return structured numpy array of partials"""
         if self.partials is None:
-            return np.array([], dtype=[('time', 'f4'),
-                                     ('freq', 'f4'),
-                                     ('amp', 'f4'),
-                                     ('phase', 'f4')])
+            return np.array([], dtype=ANALYSIS_DTYPE)
         
-        # Reshape and extract the data from loristrck's output
-        partials_data = np.squeeze(self.partials)  # Remove singleton dimensions
-        return np.array([(t, f, a, p) for t, f, a, p, _ in partials_data],
-                       dtype=[('time', 'f4'),
-                             ('freq', 'f4'),
-                             ('amp', 'f4'),
-                             ('phase', 'f4')])
+        # Reshape and extract the data from loristrck's output, dropping the
+        # bandwidth column; slicing and reshaping here only create views
+        if isinstance(self.partials, list):
+            # One (n, 5) array per partial: stack the breakpoints, converting
+            # to float32 in the same pass
+            columns = [partial[:, :4] for partial in self.partials]
+            partials_data = (np.concatenate(columns, dtype=np.float32) if columns
+                             else np.empty((0, 4), dtype=np.float32))
+        else:
+            partials_data = np.asarray(self.partials)
+            partials_data = partials_data.reshape(-1, partials_data.shape[-1])[:, :4]
+        # Only copies when the data is not already packed float32
+        out = np.ascontiguousarray(partials_data, dtype=np.float32)
+        # Reinterpret each float32 row as a record
+        return out.view(ANALYSIS_DTYPE).reshape(-1)
+
+    def get_partial_ids(self):
+        """Return the index of the partial each get_analysis_data row belongs to"""
+        if self.partials is None:
+            return np.array([], dtype=np.int32)
+        if isinstance(self.partials, list):
+            lengths = [len(partial) for partial in self.partials]
+            return np.repeat(np.arange(len(lengths), dtype=np.int32), lengths)
+        # A single (n, 5) array is one partial; leading dimensions index partials
+        shape = np.shape(self.partials)
+        rows = shape[-2] if len(shape) > 1 else 1
+        return np.repeat(np.arange(int(np.prod(shape[:-2])), dtype=np.int32), rows)
 
     def get_number_of_partials(self):
         """Return the number of partials analyzed"""
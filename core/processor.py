@@ -1,3 +1,5 @@
+import numpy as np
+
 class PartialProcessor:
     def __init__(self, partials):
         self.partials = partials.copy()
@@ -5,20 +7,35 @@ class PartialProcessor:
     def apply_transformation(self, func):
         """Apply numpy-based transformation function"""
         # Func signature: (times, freqs, amps, phases) -> modified
+        # The columns are views into self.partials, so results that func
+        # computed in place need no write-back pass
         fields = ['time', 'freq', 'amp', 'phase']
         t, f, a, p = [self.partials[field] for field in fields]
         new_f, new_a, new_p = func(t, f, a, p)
-        self.partials['freq'] = new_f
-        self.partials['amp'] = new_a
-        self.partials['phase'] = new_p
+        for column, new in ((f, new_f), (a, new_a), (p, new_p)):
+            if new is not column:
+                column[...] = new
 
     def time_stretch(self, factor):
-        self.partials['time'] *= factor
+        if factor == 1.0:
+            return
+        t = self.partials['time']
+        np.multiply(t, factor, out=t)
 
     def frequency_shift(self, shift_fn):
-        """shift_fn can be constant value or function(freq)->new_freq"""
+        """shift_fn can be constant value or function(freq)->new_freq
+
+        Callables are applied to the whole frequency array at once; functions
+        that only accept scalars fall back to a per-element pass.
+        """
         if callable(shift_fn):
-            self.partials['freq'] = np.vectorize(shift_fn)(self.partials['freq'])
+            freqs = self.partials['freq']
+            try:
+                self.partials['freq'] = np.asarray(shift_fn(freqs), dtype=freqs.dtype)
+            except (TypeError, ValueError):
+                self.partials['freq'] = np.fromiter((shift_fn(x) for x in freqs),
+                                                    dtype=freqs.dtype,
+                                                    count=freqs.size)
         else:
             self.partials['freq'] += shift_fn
 
@@ -1,3 +1,5 @@
+import threading
+
 from PyQt5.QtCore import *
 from PyQt5.QtWidgets import *
 from matplotlib.backends.backend_qt5agg import FigureCanvas
@@ -5,11 +7,47 @@ from matplotlib.figure import Figure
 from core.analyzer import SpectralAnalyzer
 from gui.partial_editor import PartialEditor
 
+class AnalyzeWorker(QObject):
+    """Runs SpectralAnalyzer.analyze_file off the GUI thread"""
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object, str)
+
+    def __init__(self, analyzer):
+        super().__init__()
+        self.analyzer = analyzer
+
+    @pyqtSlot(str, object, object)
+    def run(self, path, params, cancel_token):
+        if cancel_token.is_set():
+            return
+        # An exception escaping a queued slot aborts the whole process
+        try:
+            self.analyzer.analyze_file(path, cancelled=cancel_token.is_set, **params)
+        except Exception as exc:
+            self.failed.emit(cancel_token, str(exc))
+            return
+        if not cancel_token.is_set():
+            self.finished.emit(cancel_token)
+
 class MainWindow(QMainWindow):
+    # Queued across threads to AnalyzeWorker.run
+    analysis_requested = pyqtSignal(str, object, object)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("AudioSculptor")
         self.analyzer = SpectralAnalyzer()
+
+        # Analysis runs on a single reusable worker thread; each request gets
+        # its own token so a newer request can cancel the one in flight
+        self._cancel_token = None
+        self._analysis_thread = QThread(self)
+        self._analyze_worker = AnalyzeWorker(self.analyzer)
+        self._analyze_worker.moveToThread(self._analysis_thread)
+        self.analysis_requested.connect(self._analyze_worker.run)
+        self._analyze_worker.finished.connect(self._on_analysis_finished)
+        self._analyze_worker.failed.connect(self._on_analysis_failed)
+        self._analysis_thread.start()
         
         # Central widget with horizontal layout
         central = QWidget()
@@ -114,9 +152,26 @@ class MainWindow(QMainWindow):
         layout.addWidget(control_panel, 1)
         layout.addWidget(right_panel, 3)
 
+        # Re-analysis after a parameter change waits until the spinboxes have
+        # been idle briefly, so rapid arrow-clicks collapse into one run
+        self._analysis_timer = QTimer(self)
+        self._analysis_timer.setSingleShot(True)
+        self._analysis_timer.setInterval(150)
+        self._analysis_timer.timeout.connect(self.analyze_audio)
+
         # Connect signals
         self.browse_btn.clicked.connect(self.load_audio)
         self.analyze_btn.clicked.connect(self.analyze_audio)
+        # Analysis spinboxes keyed by their analyze_file parameter name
+        self._param_spinboxes = {
+            'win_size': self.win_size,
+            'hop': self.hop_size,
+            'threshold': self.threshold,
+            'min_dur': self.min_duration,
+            'max_partials': self.max_partials,
+        }
+        for spinbox in self._param_spinboxes.values():
+            spinbox.valueChanged.connect(self.update_analysis)
 
     def load_audio(self):
         path, _ = QFileDialog.getOpenFileName(
@@ -128,21 +183,64 @@ class MainWindow(QMainWindow):
         if path:
             self.file_selector.setText(path)
 
+    def set_params_bulk(self, **params):
+        """Set several analysis parameters, re-analyzing only once
+
+        Keywords are the analyze_file parameter names (win_size, hop,
+        threshold, min_dur, max_partials).
+        """
+        blockers = [QSignalBlocker(spinbox) for spinbox in self._param_spinboxes.values()]
+        try:
+            for name, value in params.items():
+                self._param_spinboxes[name].setValue(value)
+        finally:
+            for blocker in blockers:
+                blocker.unblock()
+        self.update_analysis()
+
+    def update_analysis(self):
+        # Re-run analysis with new parameters once the user stops adjusting
+        self._analysis_timer.start()
+
     def analyze_audio(self):
         if not self.file_selector.text():
             return
-            
-        self.analyzer.analyze_file(
+
+        if self._cancel_token is not None:
+            self._cancel_token.set()
+        self._cancel_token = threading.Event()
+        self.statusBar().showMessage("Analyzing...")
+        self.analysis_requested.emit(
             self.file_selector.text(),
-            win_size=self.win_size.value(),
-            hop=self.hop_size.value(),
-            threshold=self.threshold.value(),
-            min_dur=self.min_duration.value(),
-            max_partials=self.max_partials.value()
+            dict(
+                win_size=self.win_size.value(),
+                hop=self.hop_size.value(),
+                threshold=self.threshold.value(),
+                min_dur=self.min_duration.value(),
+                max_partials=self.max_partials.value()
+            ),
+            self._cancel_token
         )
+
+    def _on_analysis_finished(self, cancel_token):
+        # Results of a run superseded after it finished are dropped too
+        if cancel_token is not self._cancel_token:
+            return
         self.partial_editor.load_from_analyzer(self.analyzer)
         self.update_visualization()
 
+    def _on_analysis_failed(self, cancel_token, message):
+        if cancel_token is not self._cancel_token:
+            return
+        self.statusBar().showMessage(f"Analysis failed: {message}")
+
+    def closeEvent(self, event):
+        if self._cancel_token is not None:
+            self._cancel_token.set()
+        self._analysis_thread.quit()
+        self._analysis_thread.wait()
+        super().closeEvent(event)
+
     def update_visualization(self):
         self.axes.clear()
         
@@ -23,6 +23,8 @@
 #    - Create frequency mapping functions for common temperaments
 #    - Add MIDI note number ↔ frequency conversion utilities
 
+from functools import lru_cache
+
 import numpy as np
 import numpy.typing as npt
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QSplitter
@@ -30,26 +32,86 @@ from PyQt5.QtCore import Qt
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from matplotlib.figure import Figure
-from numba import jit
 import music21
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
+
+# Above this many points update_plot draws a binned amplitude density instead
+# of a scatter
+SCATTER_MAX_POINTS = 20000
+# (time, frequency) bins of the density plot
+DENSITY_BINS = (800, 400)
 
 class PartialData:
     def __init__(self):
-        # Align with analyzer.py dtype
-        self.dtype = np.dtype([
-            ('time', 'f4'),
-            ('frequency', 'f4'),
-            ('amplitude', 'f4'),
-            ('phase', 'f4'),
-            ('selected', np.bool_)
-        ])
-        self.partials = np.array([], dtype=self.dtype)
+        # Each field is stored as a separate contiguous column
+        empty = np.empty(0, dtype=np.float32)
+        self.set_columns(empty, empty, empty, empty)
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def set_columns(self, time: npt.ArrayLike, frequency: npt.ArrayLike,
+                    amplitude: npt.ArrayLike, phase: npt.ArrayLike,
+                    partial_id: Optional[npt.ArrayLike] = None) -> None:
+        """Replace the partial columns and clear the selection
+
+        partial_id gives the partial each breakpoint belongs to; without it
+        all breakpoints form a single partial.
+        """
+        self.time = np.ascontiguousarray(time, dtype=np.float32)
+        self.frequency = np.ascontiguousarray(frequency, dtype=np.float32)
+        self.amplitude = np.ascontiguousarray(amplitude, dtype=np.float32)
+        self.phase = np.ascontiguousarray(phase, dtype=np.float32)
+        if partial_id is None:
+            self.partial_id = np.zeros(len(self.time), dtype=np.int32)
+        else:
+            self.partial_id = np.ascontiguousarray(partial_id, dtype=np.int32)
+        self.selected = np.zeros(len(self.time), dtype=np.bool_)
+        self.build_time_index()
+
+    def selected_partials(self) -> List[np.ndarray]:
+        """Return the selected breakpoints as loristrck partials
+
+        Each partial is a float64 (n, 5) array of time, frequency, amplitude,
+        phase and bandwidth rows in time order, the layout lt.synthesize
+        takes. Bandwidth is not kept by the editor and is set to zero.
+        """
+        mask = self.selected
+        ids = self.partial_id[mask]
+        time = self.time[mask]
+        order = np.lexsort((time, ids))
+        rows = np.zeros((len(order), 5), dtype=np.float64)
+        rows[:, 0] = time[order]
+        rows[:, 1] = self.frequency[mask][order]
+        rows[:, 2] = self.amplitude[mask][order]
+        rows[:, 3] = self.phase[mask][order]
+        bounds = np.flatnonzero(np.diff(ids[order])) + 1
+        # A single breakpoint has no duration to synthesize
+        return [partial for partial in np.split(rows, bounds) if len(partial) > 1]
+
+    def build_time_index(self) -> None:
+        """Index partials by time so rectangle queries can binary-search"""
+        self._time_order = np.argsort(self.time, kind='stable')
+        self._sorted_time = self.time[self._time_order]
+
+    def partials_in_rect(self, tmin: float, tmax: float,
+                         fmin: float, fmax: float) -> npt.NDArray[np.bool_]:
+        """Return a mask of partials inside a time/frequency rectangle"""
+        i0 = np.searchsorted(self._sorted_time, tmin, side='left')
+        i1 = np.searchsorted(self._sorted_time, tmax, side='right')
+        candidates = self._time_order[i0:i1]
+        freqs = self.frequency[candidates]
+        mask = np.zeros(len(self), dtype=np.bool_)
+        mask[candidates[(freqs >= fmin) & (freqs <= fmax)]] = True
+        return mask
     
-    @jit(nopython=True)
     def select_partials(self, mask: npt.NDArray[np.bool_]) -> None:
         """Select partials using a boolean mask"""
-        self.partials['selected'] = mask
+        mask = np.asarray(mask, dtype=np.bool_)
+        if mask.shape != self.selected.shape:
+            raise ValueError(f"mask shape {mask.shape} does not match "
+                             f"{self.selected.shape} partials")
+        self.selected[:] = mask
 
 class PartialVisualization(FigureCanvasQTAgg):
     def __init__(self, parent=None):
@@ -57,6 +119,8 @@ class PartialVisualization(FigureCanvasQTAgg):
         super().__init__(self.fig)
         self.axes = self.fig.add_subplot(111)
         self.partial_data = None
+        self._scatter = None
+        self._density = None
         self._setup_interactions()
     
     def _setup_interactions(self):
@@ -65,6 +129,7 @@ class PartialVisualization(FigureCanvasQTAgg):
         self.fig.canvas.mpl_connect('button_release_event', self._on_mouse_release)
         self._selection_start = None
         self._selection_rect = None
+        self._background = None
     
     def _on_mouse_press(self, event):
         if event.inaxes:
@@ -74,6 +139,11 @@ class PartialVisualization(FigureCanvasQTAgg):
                 fill=False, edgecolor='r'
             )
             self.axes.add_patch(self._selection_rect)
+            # Cache everything except the rectangle so dragging only has to
+            # blit the rectangle over this background
+            self._selection_rect.set_animated(True)
+            self.draw()
+            self._background = self.copy_from_bbox(self.axes.bbox)
     
     def _on_mouse_move(self, event):
         if event.inaxes and self._selection_start:
@@ -82,7 +152,9 @@ class PartialVisualization(FigureCanvasQTAgg):
             height = event.ydata - y0
             self._selection_rect.set_width(width)
             self._selection_rect.set_height(height)
-            self.draw()
+            self.restore_region(self._background)
+            self.axes.draw_artist(self._selection_rect)
+            self.blit(self.axes.bbox)
     
     def _on_mouse_release(self, event):
         if event.inaxes and self._selection_start:
@@ -92,29 +164,55 @@ class PartialVisualization(FigureCanvasQTAgg):
             ymin, ymax = min(y0, y1), max(y0, y1)
             
             # Select partials in rectangle
-            mask = (
-                (self.partial_data.partials['time'] >= xmin) &
-                (self.partial_data.partials['time'] <= xmax) &
-                (self.partial_data.partials['frequency'] >= ymin) &
-                (self.partial_data.partials['frequency'] <= ymax)
-            )
+            mask = self.partial_data.partials_in_rect(xmin, xmax, ymin, ymax)
             self.partial_data.select_partials(mask)
             
             # Cleanup
             self._selection_rect.remove()
             self._selection_rect = None
             self._selection_start = None
+            self._background = None
             self.update_plot(self.partial_data)
 
     def update_plot(self, partial_data: PartialData):
-        self.axes.clear()
+        # Artists are updated in place rather than clearing the axes, which
+        # would rebuild ticks, grid and limits on every refresh
         self.partial_data = partial_data
-        self.axes.scatter(
-            partial_data.partials['time'],
-            partial_data.partials['frequency'],
-            c=partial_data.partials['amplitude'],
-            alpha=0.6
-        )
+        # Limits are recomputed from the new data only
+        self.axes.ignore_existing_data_limits = True
+        if len(partial_data) > SCATTER_MAX_POINTS:
+            if self._scatter is not None:
+                self._scatter.remove()
+                self._scatter = None
+            # Too many points to scatter interactively; show amplitude density
+            H, xedges, yedges = np.histogram2d(
+                partial_data.time,
+                partial_data.frequency,
+                bins=DENSITY_BINS,
+                weights=partial_data.amplitude
+            )
+            if self._density is not None:
+                self._density.remove()
+            self._density = self.axes.pcolormesh(xedges, yedges, H.T, shading='auto')
+        else:
+            if self._density is not None:
+                self._density.remove()
+                self._density = None
+            offsets = np.column_stack((partial_data.time, partial_data.frequency))
+            if self._scatter is None:
+                self._scatter = self.axes.scatter(
+                    partial_data.time,
+                    partial_data.frequency,
+                    c=partial_data.amplitude,
+                    alpha=0.6
+                )
+            else:
+                self._scatter.set_offsets(offsets)
+                self._scatter.set_array(partial_data.amplitude)
+                self._scatter.autoscale()
+            # relim() ignores collections, so update the data limits by hand
+            self.axes.update_datalim(offsets)
+        self.axes.autoscale_view()
         self.draw()
 
 from .synthesizer import RealTimeSynthesizer
@@ -124,6 +222,7 @@ class PartialEditor(QWidget):
         super().__init__(parent)
         self.partial_data = PartialData()
         self.synthesizer = None
+        self.sr = 44100
         self.setup_ui()
     
     def play_selected(self):
@@ -131,10 +230,9 @@ class PartialEditor(QWidget):
         if self.synthesizer:
             self.synthesizer.stop_playback()
         
-        selected_mask = self.partial_data.partials['selected']
-        if selected_mask.any():
-            selected_data = self.partial_data.partials[selected_mask]
-            self.synthesizer = RealTimeSynthesizer(selected_data)
+        selected = self.partial_data.selected_partials()
+        if selected:
+            self.synthesizer = RealTimeSynthesizer(selected, self.sr)
             self.synthesizer.start_playback()
         
     def setup_ui(self):
@@ -152,32 +250,76 @@ class PartialEditor(QWidget):
         layout.addWidget(splitter)
     
     def load_partials(self, time: np.ndarray, freq: np.ndarray, 
-                     amp: np.ndarray, phase: np.ndarray):
+                     amp: np.ndarray, phase: np.ndarray,
+                     partial_id: Optional[np.ndarray] = None):
         """Load partial data into the editor"""
-        n_partials = len(time)
-        self.partial_data.partials = np.zeros(n_partials, dtype=self.partial_data.dtype)
-        self.partial_data.partials['time'] = time
-        self.partial_data.partials['frequency'] = freq
-        self.partial_data.partials['amplitude'] = amp
-        self.partial_data.partials['phase'] = phase
+        self.partial_data.set_columns(
+            np.array(time, dtype=np.float32),
+            np.array(freq, dtype=np.float32),
+            np.array(amp, dtype=np.float32),
+            np.array(phase, dtype=np.float32),
+            None if partial_id is None else np.array(partial_id, dtype=np.int32)
+        )
         self.visualization.update_plot(self.partial_data)
     
     def load_from_analyzer(self, analyzer):
         """Load partial data from SpectralAnalyzer instance"""
         analysis_data = analyzer.get_analysis_data()
-        self.partial_data.partials = np.zeros(len(analysis_data), dtype=self.partial_data.dtype)
-        self.partial_data.partials['time'] = analysis_data['time']
-        self.partial_data.partials['frequency'] = analysis_data['freq']
-        self.partial_data.partials['amplitude'] = analysis_data['amp']
-        self.partial_data.partials['phase'] = analysis_data['phase']
-        self.partial_data.partials['selected'] = False
+        n_partials = len(analysis_data)
+        # Transpose the (N, 4) float32 records in one copy; each row of the
+        # result is then a contiguous column
+        time, freq, amp, phase = analysis_data.view(np.float32).reshape(n_partials, 4).T.copy()
+        self.partial_data.set_columns(time, freq, amp, phase,
+                                      analyzer.get_partial_ids())
+        self.sr = analyzer.sr
         self.visualization.update_plot(self.partial_data)
 
 # Musical scaling utilities
-def midi_to_freq(midi_note: float) -> float:
-    """Convert MIDI note number to frequency"""
-    return 440.0 * (2.0 ** ((midi_note - 69) / 12.0))
+# Frequencies of the 128 MIDI note numbers, for integer lookups
+_MIDI_TO_FREQ = 440.0 * np.exp2((np.arange(128) - 69) / 12.0)
+
+def midi_to_freq(midi_note: npt.ArrayLike) -> np.ndarray:
+    """Convert MIDI note number(s) to frequency"""
+    midi_note = np.asarray(midi_note)
+    if (midi_note.dtype.kind in 'iu' and midi_note.size
+            and midi_note.min() >= 0 and midi_note.max() < 128):
+        return _MIDI_TO_FREQ[midi_note]
+    return 440.0 * np.exp2((midi_note - 69) / 12.0)
+
+def freq_to_midi(frequency: npt.ArrayLike) -> np.ndarray:
+    """Convert frequency (or an array of frequencies) to MIDI note number"""
+    return 69.0 + 12.0 * np.log2(np.asarray(frequency) / 440.0)
+
+# music21 scale classes available to make_snapper
+SCALES = {
+    'major': music21.scale.MajorScale,
+    'minor': music21.scale.MinorScale,
+    'harmonic minor': music21.scale.HarmonicMinorScale,
+    'melodic minor': music21.scale.MelodicMinorScale,
+    'dorian': music21.scale.DorianScale,
+    'phrygian': music21.scale.PhrygianScale,
+    'lydian': music21.scale.LydianScale,
+    'mixolydian': music21.scale.MixolydianScale,
+    'locrian': music21.scale.LocrianScale,
+    'whole tone': music21.scale.WholeToneScale,
+    'chromatic': music21.scale.ChromaticScale,
+}
+
+@lru_cache(maxsize=None)
+def make_snapper(scale_name: str, root: str = 'C') -> Callable[[npt.ArrayLike], np.ndarray]:
+    """Create a function snapping frequencies to the nearest note of a scale
+
+    music21 is only consulted here to list the scale's MIDI notes; the
+    returned function works on whole frequency arrays with a binary search.
+    """
+    scale = SCALES[scale_name](root)
+    notes = np.unique([p.midi for p in scale.getPitches('C0', 'C9')])
+
+    def snap(frequency: npt.ArrayLike) -> np.ndarray:
+        midi = freq_to_midi(frequency)
+        hi = np.clip(np.searchsorted(notes, midi), 1, len(notes) - 1)
+        lo = hi - 1
+        nearest = np.where(midi - notes[lo] <= notes[hi] - midi, notes[lo], notes[hi])
+        return midi_to_freq(nearest)
 
-def freq_to_midi(frequency: float) -> float:
-    """Convert frequency to MIDI note number"""
-    return 69 + 12 * np.log2(frequency / 440.0)
\ No newline at end of file
+    return snap
@@ -1,25 +1,66 @@
+import os
+
+import loristrck as lt
+import numpy as np
 import sounddevice as sd
+from joblib import Parallel, delayed
 
 class RealTimeSynthesizer:
     def __init__(self, partials, sr=44100):
+        """partials is a list of float64 (n, 5) loristrck partial arrays"""
         self.partials = partials
         self.sr = sr
         self.stream = None
+        self.buf = None
+        self.pos = 0
 
     def start_playback(self):
         """Stream synthesized audio in real-time"""
+        # Render once up front; the callback only copies out of the buffer
+        self.buf = self.render()
+        self.pos = 0
+
         def callback(outdata, frames, time, status):
-            # Resynthesis happens here
-            synth_sig = lt.synthesize(self.partials, self.sr)
-            outdata[:] = synth_sig.reshape(-1, 1)
+            end = self.pos + frames
+            chunk = self.buf[self.pos:end]
+            outdata[:len(chunk), 0] = chunk
+            outdata[len(chunk):] = 0
+            self.pos = end
+            if len(chunk) < frames:
+                raise sd.CallbackStop
 
         self.stream = sd.OutputStream(
             samplerate=self.sr,
             channels=1,
+            dtype='float32',
             callback=callback
         )
         self.stream.start()
 
+    def render(self):
+        """Synthesize all partials into a float32 buffer
+
+        Partials are independent oscillators, so groups of them are rendered
+        on worker threads and summed.
+        """
+        n_jobs = min(os.cpu_count() or 1, len(self.partials))
+        if n_jobs <= 1:
+            return lt.synthesize(self.partials, self.sr).astype(np.float32, copy=False)
+
+        bounds = np.linspace(0, len(self.partials), n_jobs + 1).astype(int)
+        groups = [self.partials[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+        # lt.synthesize starts its output at the earliest breakpoint it is
+        # given, so every group is rendered from the overall earliest onset
+        # to keep the buffers aligned with a serial render
+        start = min(partial[0, 0] for partial in self.partials)
+        bufs = Parallel(n_jobs=n_jobs, prefer='threads')(
+            delayed(lt.synthesize)(group, self.sr, start=start) for group in groups
+        )
+        out = np.zeros(max(len(b) for b in bufs), dtype=np.float32)
+        for b in bufs:
+            out[:len(b)] += b
+        return out
+
     def stop_playback(self):
         if self.stream:
-            self.stream.stop()
\ No newline at end of file
+            self.stream.stop()
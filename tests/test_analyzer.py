@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+lt = pytest.importorskip("loristrck")
+sf = pytest.importorskip("soundfile")
+
+from core.analyzer import SpectralAnalyzer
+
+
+def test_blocked_analysis_keeps_held_sine_continuous(tmp_path):
+    """A sine spanning several blocks comes back as one gap-free partial"""
+    sr = 44100
+    blocksize = 1 << 16
+    duration = 4 * blocksize / sr
+    t = np.arange(int(duration * sr)) / sr
+    path = tmp_path / "sine.wav"
+    sf.write(str(path), 0.5 * np.sin(2 * np.pi * 440.0 * t), sr, subtype='FLOAT')
+
+    analyzer = SpectralAnalyzer()
+    analyzer.sr = sr
+    analyzer.analyze_blocks(str(path), blocksize=blocksize)
+
+    sine = [p for p in analyzer.partials if abs(np.median(p[:, 1]) - 440.0) < 20.0]
+    assert len(sine) == 1
+    times = sine[0][:, 0]
+    assert times[0] < 0.1
+    assert times[-1] > duration - 0.1
+    steps = np.diff(times)
+    assert (steps > 0).all()
+    assert steps.max() < 0.05